@@ -1,29 +1,77 @@
-from flask import Flask, request, jsonify
-from playlist_analyzer import analyze_playlist_sync
+from contextlib import asynccontextmanager
+from typing import Optional
 import os
 
-app = Flask(__name__)
+import orjson
+from fastapi import FastAPI, File, UploadFile
+from fastapi.responses import HTMLResponse, Response
+import playlist_analyzer
+from playlist_analyzer import analyze_playlist, available_cpus, create_session, shutdown_parse_pool
 
-@app.route('/')
-def home():
+# Link check results are cached across requests (and workers) in this SQLite file
+LINK_CACHE_PATH = os.environ.get(
+    'LINK_CACHE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'linkcache.db')
+)
+
+# Connection limits of the pool shared by every request. Each request's analyzer
+# still caps itself (20 in flight, 4 per host), these only need to stay above
+# what concurrent requests add up to: waiting for a pooled connection counts
+# against a link check's timeout.
+SHARED_POOL_LIMIT = 512
+SHARED_POOL_LIMIT_PER_HOST = 64
+
+# Every server process (uvicorn --workers, read from WEB_CONCURRENCY) starts its
+# own parsing pool, so the available CPUs are split between them. PARSE_WORKERS
+# overrides this, e.g. when a container CPU quota is below the visible CPUs.
+PARSE_WORKERS = int(os.environ.get('PARSE_WORKERS', 0)) or max(
+    1, available_cpus() // int(os.environ.get('WEB_CONCURRENCY', 1))
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    playlist_analyzer.MAX_PARSE_WORKERS = PARSE_WORKERS
+    # One connection pool for the whole process, shared by every request
+    app.state.session = create_session(
+        max_concurrent=SHARED_POOL_LIMIT,
+        max_per_host=SHARED_POOL_LIMIT_PER_HOST
+    )
+    yield
+    await app.state.session.close()
+    shutdown_parse_pool()
+
+app = FastAPI(lifespan=lifespan)
+
+def json_response(data: dict, status_code: int = 200) -> Response:
+    # Reports can hold thousands of channels, orjson serializes them much faster than stdlib json
+    return Response(orjson.dumps(data), status_code=status_code, media_type='application/json')
+
+@app.get('/', response_class=HTMLResponse)
+async def home():
     return """
     <h1>⚡ Volt Stream Analyzer API</h1>
     <p>Working! Use POST /analyze to analyze playlists</p>
     """
 
-@app.route('/analyze', methods=['POST'])
-def analyze():
-    if 'playlist' not in request.files:
-        return jsonify({'error': 'No playlist file'}), 400
+@app.post('/analyze')
+async def analyze(playlist: Optional[UploadFile] = File(None)):
+    if playlist is None:
+        return json_response({'error': 'No playlist file'}, status_code=400)
     
-    file = request.files['playlist']
-    file.save('temp.m3u')
+    # Parse the upload in memory, no temp file round trip
+    content = (await playlist.read()).decode('utf-8', errors='ignore')
+    report = await analyze_playlist(
+        content=content,
+        check_links=True,
+        session=app.state.session,
+        cache_path=LINK_CACHE_PATH
+    )
     
-    report = analyze_playlist_sync('temp.m3u', check_links=True)
-    os.remove('temp.m3u')
-    
-    return jsonify(report)
+    return json_response(report)
 
 if __name__ == '__main__':
+    import uvicorn
+    
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    uvicorn.run(app, host='0.0.0.0', port=port)
@@ -3,98 +3,741 @@ IPTV Playlist Analyzer - Step 2: Link Checking Added
 Now detects dead/working channels with async HTTP checks
 """
 
+import os
 import re
+import ssl
+import sys
+import time
+import sqlite3
+import threading
 import asyncio
 import aiohttp
-from typing import Dict, List, Tuple
-from urllib.parse import urlparse
-from datetime import datetime
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager, nullcontext
+from functools import partial
+from itertools import islice
+from collections import Counter
+from typing import AsyncContextManager, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+try:
+    import aiodns  # noqa: F401 - enables aiohttp's AsyncResolver
+    HAS_AIODNS = True
+except ImportError:
+    HAS_AIODNS = False
+
+# key="value" pairs in an #EXTINF attribute string (tvg-id, tvg-logo, group-title, ...)
+_ATTR_RE = re.compile(r'([\w-]+)="([^"]*)"')
+
+# Dotted-quad host, octets are range-checked separately
+_OCTET_RE = re.compile(r'^(\d{1,3})\.(\d{1,3})\.(\d{1,3})\.(\d{1,3})$')
+
+# Reserved TLDs that never resolve to a public stream (RFC 2606 / RFC 6761)
+_RESERVED_TLDS = frozenset({'invalid', 'test', 'localhost'})
+
+# Link checks retry transient failures (connection resets, 5xx, 429) up to
+# MAX_RETRIES times, waiting RETRY_BASE_DELAY * 2**attempt seconds between tries.
+# Timeouts aren't retried: the attempt already used the whole timeout budget.
+MAX_RETRIES = 2
+RETRY_BASE_DELAY = 0.25
+
+# Start of an #EXTINF line that begins a channel entry, used as a safe split point
+_ENTRY_START_RE = re.compile(r'^[ \t]*#EXTINF:[^,\n]*,', re.MULTILINE)
+
+# In-memory playlists are parsed across worker processes once there is at
+# least this much content per worker; below that, shipping chunks and results
+# between processes costs more than it saves
+PARALLEL_PARSE_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Upper bound on parsing processes (None: one per available CPU). Set it before
+# the pool starts, e.g. to share CPUs between several server processes.
+MAX_PARSE_WORKERS: Optional[int] = None
+
+# Process pool for parsing, started on first use and reused (see _parse_pool)
+_PARSE_POOL: Optional[ProcessPoolExecutor] = None
+_PARSE_POOL_LOCK = threading.Lock()
+
+# Content types that mean we actually reached a stream (compared lowercased)
+_STREAM_CONTENT_TYPES = frozenset({
+    'application/vnd.apple.mpegurl',
+    'application/x-mpegurl',
+    'video/mp2t'
+})
+
+# TLS context shared by every link check connection. Certificates are NOT
+# verified: we only want to know whether the stream endpoint answers, and many
+# IPTV hosts use self-signed or expired certs. Don't reuse this context for
+# anything that sends credentials or trusts the response content.
+_LIVENESS_SSL_CONTEXT = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+_LIVENESS_SSL_CONTEXT.check_hostname = False
+_LIVENESS_SSL_CONTEXT.verify_mode = ssl.CERT_NONE
+
+# How long a link check result stays valid in the on-disk cache (seconds).
+# Dead links expire quickly so transient failures get re-probed on the next run.
+CACHE_TTL_WORKING = 13 * 86400
+CACHE_TTL_FAILED = 9
+
+# Seconds a cache statement waits on another process's write lock before giving
+# up. Kept short: a cache miss only costs one extra request.
+CACHE_BUSY_TIMEOUT = 0.5
+
+def _url_host(url: str) -> str:
+    """
+    Hostname of a stream URL ('' if it has none or can't be parsed)
+    """
+    # Parsed once per unique URL when checking links, never at parse time.
+    # Interned since many URLs usually share a handful of hosts.
+    try:
+        return sys.intern(urlsplit(url).hostname or '')
+    except ValueError:
+        return ''
+
+
+def _parse_m3u_lines(lines: Iterable[str], columns: Tuple[List[str], ...]) -> None:
+    """
+    Parse M3U lines one at a time, appending each channel's fields to columns
+    
+    Args:
+        lines: Any iterable of lines (open file, StringIO, list)
+        columns: (names, groups, logos, attributes, urls) lists to append to
+    """
+    names, groups, logos, attributes_column, urls = columns
+    current_channel = None
+    
+    for line in lines:
+        line = line.strip()
+        
+        # Skip empty lines and M3U header
+        if not line or line == '#EXTM3U':
+            continue
+        
+        # Parse channel info line
+        if line.startswith('#EXTINF:'):
+            # Extract channel name and attributes
+            # Format: #EXTINF:-1 tvg-id="..." tvg-name="..." group-title="...",Channel Name
+            
+            # Get everything after #EXTINF:
+            info = line[8:]
+            
+            # Split by comma to separate attributes from name
+            parts = info.split(',', 1)
+            
+            if len(parts) == 2:
+                current_channel = (parts[1].strip(), parts[0])
+                
+        # Parse URL line
+        elif line.startswith(('http://', 'https://')):
+            if current_channel:
+                channel_name, attributes = current_channel
+                
+                # Extract all attributes in a single scan
+                attrs = dict(_ATTR_RE.findall(attributes))
+                
+                names.append(channel_name)
+                groups.append(attrs.get('group-title', 'Uncategorized'))
+                logos.append(attrs.get('tvg-logo', ''))
+                attributes_column.append(attributes)
+                urls.append(line)
+                current_channel = None
+
+
+def _parse_chunk(chunk: str) -> Tuple[List[str], ...]:
+    """
+    Parse a chunk of M3U content
+    
+    Module level so it can be sent to a worker process.
+    
+    Args:
+        chunk: M3U content starting at an #EXTINF line (or the file start)
+        
+    Returns:
+        (names, groups, logos, attributes, urls) column lists. Columns
+        pickle smaller than one tuple per channel.
+    """
+    columns = ([], [], [], [], [])
+    # Split on '\n' only, like iterating over a StringIO of the same content
+    _parse_m3u_lines(chunk.split('\n'), columns)
+    return columns
+
+
+def _split_content(content: str, parts: int) -> List[str]:
+    """
+    Split M3U content into roughly equal chunks at #EXTINF entry boundaries
+    """
+    chunks = []
+    start = 0
+    
+    for k in range(1, parts):
+        match = _ENTRY_START_RE.search(content, max(start + 1, len(content) * k // parts))
+        if not match:
+            break
+        chunks.append(content[start:match.start()])
+        start = match.start()
+    
+    chunks.append(content[start:])
+    return chunks
+
+
+def available_cpus() -> int:
+    """
+    Number of CPUs this process is allowed to run on
+    
+    Unlike os.cpu_count(), respects CPU affinity and cpusets (e.g. docker
+    --cpuset-cpus) where the platform supports it. CPU quotas aren't visible
+    here, cap MAX_PARSE_WORKERS for those.
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # No sched_getaffinity on macOS and Windows
+        return os.cpu_count() or 1
+
+
+def _parse_workers() -> int:
+    """
+    Number of parsing processes to use, see MAX_PARSE_WORKERS
+    """
+    workers = available_cpus()
+    if MAX_PARSE_WORKERS:
+        workers = min(workers, MAX_PARSE_WORKERS)
+    return workers
+
+
+def _parse_pool() -> ProcessPoolExecutor:
+    """
+    Return the shared parsing pool, starting it on first use
+    
+    Workers are spawned rather than forked, so starting the pool from a
+    process that is already running an event loop and threads (uvicorn) is safe.
+    """
+    global _PARSE_POOL
+    
+    with _PARSE_POOL_LOCK:
+        if _PARSE_POOL is None:
+            _PARSE_POOL = ProcessPoolExecutor(
+                max_workers=_parse_workers(),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _PARSE_POOL
+
+
+def shutdown_parse_pool() -> None:
+    """
+    Stop the shared parsing pool's worker processes (if it was started)
+    """
+    global _PARSE_POOL
+    
+    with _PARSE_POOL_LOCK:
+        if _PARSE_POOL is not None:
+            _PARSE_POOL.shutdown()
+            _PARSE_POOL = None
+
+
+def _invalid_host_error(host: str) -> Optional[str]:
+    """
+    Return why a host can never be reached, or None if it looks valid
+    
+    Args:
+        host: Hostname from the stream URL (lowercase, may be empty)
+    """
+    if not host:
+        return 'Invalid URL'
+    
+    octets = _OCTET_RE.match(host)
+    if octets and any(int(octet) > 255 for octet in octets.groups()):
+        return 'Invalid IP address'
+    
+    # Bare "localhost" is fine for local streams, "*.localhost" isn't
+    if '.' in host and host.rstrip('.').rsplit('.', 1)[-1] in _RESERVED_TLDS:
+        return 'Reserved domain'
+    
+    return None
+
+
+def _liveness_timeout(timeout: float) -> aiohttp.ClientTimeout:
+    """
+    Timeout for one link check attempt: DNS, connecting and receiving the
+    response headers together get `timeout` seconds of wall-clock time, so a
+    host that trickles its response can't hold a slot indefinitely.
+    
+    aiohttp also counts time spent waiting for a free pooled connection,
+    so connector limits must stay at or above the admission limits (see
+    create_session).
+    """
+    return aiohttp.ClientTimeout(total=timeout)
+
+
+def create_session(max_concurrent: int = 20, max_per_host: int = 4, timeout: int = 5) -> aiohttp.ClientSession:
+    """
+    Create an aiohttp session tuned for link checking
+    
+    Must be called from a running event loop. The session can be shared by
+    many analyzers (e.g. across API requests) so connections stay pooled;
+    give a shared session limits well above a single analyzer's so that each
+    analyzer's own admission control does the gating. Time spent waiting
+    for a pooled connection counts against a check's timeout.
+    
+    Args:
+        max_concurrent: Maximum number of open connections
+        max_per_host: Maximum number of open connections to a single host
+        timeout: Default time limit per request in seconds
+        
+    Returns:
+        New ClientSession, the caller is responsible for closing it
+    """
+    connector = aiohttp.TCPConnector(
+        limit=max_concurrent,
+        limit_per_host=max_per_host,
+        use_dns_cache=True,
+        ttl_dns_cache=300,
+        resolver=aiohttp.AsyncResolver() if HAS_AIODNS else None,
+        ssl=_LIVENESS_SSL_CONTEXT,
+        enable_cleanup_closed=True
+    )
+    
+    # Streams never need cookies, so skip cookie jar bookkeeping entirely
+    return aiohttp.ClientSession(
+        connector=connector,
+        cookie_jar=aiohttp.DummyCookieJar(),
+        timeout=_liveness_timeout(timeout)
+    )
 
 class PlaylistAnalyzer:
     """
     Analyzes M3U/M3U8 playlists and provides health reports
     """
     
-    def __init__(self):
-        self.channels = []
+    def __init__(self, cache_path: Optional[str] = None):
+        """
+        Args:
+            cache_path: SQLite file for cached link check results (caching is off if None)
+        """
+        # Channel fields are stored column-wise (one list per field) to keep
+        # large playlists compact; dicts are only built for reports
+        self._names: List[str] = []
+        self._urls: List[str] = []
+        self._groups: List[str] = []
+        self._logos: List[str] = []
+        self._attributes: List[str] = []
         self.total_channels = 0
         self.working_channels = 0
         self.dead_channels = 0
-        self.checked_channels = []
         
-    async def check_link(self, url: str, timeout: int = 5) -> Dict:
+        # Link check results from the last check_all_links run, one per unique URL
+        self._results: Dict[str, Dict] = {}
+        
+        # Link check cache, only open while check_all_links is running
+        self.cache_path = cache_path
+        self._cache: Optional[sqlite3.Connection] = None
+        # Cache calls run in worker threads (asyncio.to_thread), one at a time
+        self._cache_lock = threading.Lock()
+        
+        # Admission control for link checks, set up per run in check_all_links
+        self._global_slots: Optional[asyncio.Semaphore] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._max_per_host = 4
+    
+    def _channel(self, i: int) -> Dict:
+        """
+        Build the channel dict for the i-th parsed channel
+        """
+        return {
+            'name': self._names[i],
+            'group': self._groups[i],
+            'logo': self._logos[i],
+            'attributes': self._attributes[i],
+            'url': self._urls[i]
+        }
+    
+    @property
+    def channels(self) -> List[Dict]:
+        """
+        All parsed channels as dicts (built on demand, so mutating the
+        returned list doesn't change the analyzer; assign to replace them)
+        """
+        return [self._channel(i) for i in range(len(self._urls))]
+    
+    @channels.setter
+    def channels(self, channels: Iterable[Dict]) -> None:
+        for column in (self._names, self._groups, self._logos, self._attributes, self._urls):
+            column.clear()
+        
+        self._append_rows([
+            (
+                ch['name'],
+                ch.get('group', 'Uncategorized'),
+                ch.get('logo', ''),
+                ch.get('attributes', ''),
+                ch['url']
+            )
+            for ch in channels
+        ])
+        self.total_channels = len(self._urls)
+        self._results = {}
+    
+    @property
+    def checked_channels(self) -> List[Dict]:
+        """
+        Checked channels merged with their link check results (built on demand)
+        """
+        return [
+            {**self._channel(i), **self._results[url]}
+            for i, url in enumerate(self._urls)
+            if url in self._results
+        ]
+        
+    async def check_link(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        timeout: int = 5,
+        slot: Optional[Callable[[], AsyncContextManager]] = None
+    ) -> Dict:
         """
         Check if a stream URL is working
         
+        Connection resets, 5xx and 429 responses are retried with exponential
+        backoff (429 honors Retry-After) before giving up. Timeouts and DNS
+        failures are not retried.
+        
         Args:
+            session: Shared aiohttp session (reuses pooled connections)
             url: Stream URL to check
-            timeout: Request timeout in seconds
+            timeout: Wall-clock time limit for each attempt in seconds
+            slot: Returns an async context manager held for each attempt
+                (e.g. admission control), released while backing off
             
         Returns:
-            Dict with status and response time
+            Dict with status and response time (of the last attempt)
         """
-        try:
-            async with aiohttp.ClientSession() as session:
-                start_time = datetime.now()
-                async with session.head(url, timeout=timeout, allow_redirects=True) as response:
-                    response_time = (datetime.now() - start_time).total_seconds()
-                    
-                    is_working = response.status in [200, 301, 302, 403]  # 403 sometimes means it's live but needs auth
+        if slot is None:
+            slot = nullcontext
+        
+        for attempt in range(MAX_RETRIES + 1):
+            last_attempt = attempt == MAX_RETRIES
+            delay = RETRY_BASE_DELAY * 2 ** attempt
+            
+            async with slot():
+                start_time = time.perf_counter()
+                try:
+                    # Many IPTV origins reject HEAD, so ask for the first byte only
+                    async with session.get(
+                        url,
+                        headers={'Range': 'bytes=0-0'},
+                        timeout=_liveness_timeout(timeout),
+                        allow_redirects=True
+                    ) as response:
+                        response_time = time.perf_counter() - start_time
+                        content_type = response.content_type.lower()
+                        retry_after = response.headers.get('Retry-After', '')
+                        # Status and headers are all we need, don't read the body
+                        response.release()
+                except asyncio.TimeoutError:
+                    return {
+                        'url': url,
+                        'working': False,
+                        'status_code': 0,
+                        'error': 'Timeout',
+                        'response_time': round(time.perf_counter() - start_time, 2)
+                    }
+                except aiohttp.ClientConnectionError as e:
+                    # A host that doesn't resolve won't start resolving a second later
+                    if last_attempt or isinstance(e, aiohttp.ClientConnectorDNSError):
+                        return {
+                            'url': url,
+                            'working': False,
+                            'status_code': 0,
+                            'error': str(e)[:50],  # Truncate long errors
+                            'response_time': round(time.perf_counter() - start_time, 2)
+                        }
+                    response = None
+                except Exception as e:
+                    return {
+                        'url': url,
+                        'working': False,
+                        'status_code': 0,
+                        'error': str(e)[:50],  # Truncate long errors
+                        'response_time': round(time.perf_counter() - start_time, 2)
+                    }
+            
+            if response is not None:
+                # Server-side trouble is worth another try, anything else is final
+                if last_attempt or not (response.status >= 500 or response.status == 429):
+                    is_working = (
+                        (response.status < 400 and content_type in _STREAM_CONTENT_TYPES)
+                        or response.status in [200, 206, 301, 302, 403]  # 403 sometimes means it's live but needs auth
+                    )
                     
                     return {
                         'url': url,
                         'working': is_working,
                         'status_code': response.status,
+                        'content_type': content_type,
                         'response_time': round(response_time, 2)
                     }
-        except asyncio.TimeoutError:
-            return {
-                'url': url,
-                'working': False,
-                'status_code': 0,
-                'error': 'Timeout',
-                'response_time': timeout
-            }
-        except Exception as e:
+                
+                if response.status == 429 and retry_after.isdigit():
+                    delay = min(int(retry_after), timeout)
+            
+            # Back off outside the slot so other checks can use it meanwhile
+            await asyncio.sleep(delay)
+    
+    def _open_cache(self) -> None:
+        """
+        Open the link check cache, creating the table if needed
+        
+        Any SQLite error just leaves caching disabled for this run.
+        """
+        if not self.cache_path:
+            return
+        
+        db = None
+        try:
+            # Autocommit (isolation_level=None) keeps every write its own short
+            # transaction, and WAL lets other analyzers read while one writes
+            db = sqlite3.connect(
+                self.cache_path,
+                timeout=CACHE_BUSY_TIMEOUT,
+                isolation_level=None,
+                check_same_thread=False
+            )
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS link_checks ('
+                'url TEXT PRIMARY KEY, status INTEGER, working INTEGER, error TEXT, '
+                'content_type TEXT, response_time REAL, ts REAL)'
+            )
+        except sqlite3.Error as e:
+            print(f"⚠️  Link cache unavailable, checking without it: {e}")
+            if db is not None:
+                db.close()
+            return
+        
+        with self._cache_lock:
+            self._cache = db
+    
+    def _close_cache(self) -> None:
+        """
+        Close the cache connection
+        """
+        with self._cache_lock:
+            if self._cache is not None:
+                try:
+                    self._cache.close()
+                except sqlite3.Error:
+                    pass
+                self._cache = None
+    
+    def _cache_get(self, url: str) -> Optional[Dict]:
+        """
+        Return the cached check result for url if it hasn't expired yet
+        
+        Blocking, call through asyncio.to_thread. Errors count as a cache miss.
+        """
+        with self._cache_lock:
+            if self._cache is None:
+                return None
+            try:
+                row = self._cache.execute(
+                    'SELECT status, working, error, content_type, response_time, ts '
+                    'FROM link_checks WHERE url = ?',
+                    (url,)
+                ).fetchone()
+            except sqlite3.Error:
+                return None
+        
+        if row is None:
+            return None
+        
+        status, working, error, content_type, response_time, ts = row
+        ttl = CACHE_TTL_WORKING if working else CACHE_TTL_FAILED
+        if ts + ttl <= time.time():
+            return None
+        
+        # Same keys as a live check_link result, plus 'cached'
+        result = {'url': url, 'working': bool(working), 'status_code': status}
+        if content_type is not None:
+            result['content_type'] = content_type
+        if error is not None:
+            result['error'] = error
+        result['response_time'] = response_time
+        result['cached'] = True
+        return result
+    
+    def _cache_put(self, result: Dict) -> None:
+        """
+        Store a fresh check result in the cache
+        
+        Blocking, call through asyncio.to_thread. Errors are ignored, the
+        result just isn't cached.
+        """
+        with self._cache_lock:
+            if self._cache is None:
+                return
+            try:
+                self._cache.execute(
+                    'INSERT OR REPLACE INTO link_checks '
+                    '(url, status, working, error, content_type, response_time, ts) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (
+                        result['url'],
+                        result['status_code'],
+                        int(result['working']),
+                        result.get('error'),
+                        result.get('content_type'),
+                        result['response_time'],
+                        time.time()
+                    )
+                )
+            except sqlite3.Error:
+                pass
+    
+    @asynccontextmanager
+    async def _slot(self, host: str):
+        """
+        Hold one per-host and one global link check slot
+        """
+        host_slots = self._host_slots.get(host)
+        if host_slots is None:
+            host_slots = self._host_slots[host] = asyncio.Semaphore(self._max_per_host)
+        
+        # Per-host slot first, so checks queued behind a slow host never sit on
+        # a global slot. Each release wakes exactly one waiter.
+        async with host_slots:
+            async with self._global_slots:
+                yield
+    
+    async def _check_with_limit(self, session: aiohttp.ClientSession, url: str, host: str, timeout: int = 5) -> Dict:
+        """
+        Check a link once both the global and per-host limits allow it
+        
+        A single slow host can only ever hold max_per_host slots, so it can't
+        stall checks against every other host in the playlist. Cached results
+        and URLs that can never work (no host, impossible IP, reserved TLD)
+        are returned straight away without taking a slot.
+        
+        Args:
+            session: Shared aiohttp session
+            url: Stream URL to check
+            host: Hostname of the URL
+            timeout: Request timeout in seconds
+            
+        Returns:
+            Dict with status and response time
+        """
+        error = _invalid_host_error(host)
+        if error:
             return {
                 'url': url,
                 'working': False,
                 'status_code': 0,
-                'error': str(e)[:50],  # Truncate long errors
+                'error': error,
                 'response_time': 0
             }
+        
+        if self._cache is not None:
+            cached = await asyncio.to_thread(self._cache_get, url)
+            if cached is not None:
+                return cached
+        
+        # Slots are held per attempt, not across retry backoff
+        result = await self.check_link(session, url, timeout, slot=partial(self._slot, host))
+        
+        if self._cache is not None:
+            await asyncio.to_thread(self._cache_put, result)
+        return result
     
-    async def check_all_links(self, max_concurrent: int = 20) -> List[Dict]:
+    async def check_all_links(
+        self,
+        max_concurrent: int = 20,
+        timeout: int = 5,
+        max_per_host: int = 4,
+        session: Optional[aiohttp.ClientSession] = None
+    ) -> List[Dict]:
         """
         Check all channel links concurrently
         
         Args:
             max_concurrent: Maximum number of concurrent requests
+            timeout: Request timeout in seconds
+            max_per_host: Maximum number of concurrent requests to a single host
+            session: Shared session from create_session (a new one is created and closed if None)
             
         Returns:
-            List of check results
+            List of check results, one per unique URL (see checked_channels
+            for per-channel results)
         """
-        print(f"\n🔍 Checking {len(self.channels)} links...")
+        # Playlists often repeat a URL under several names (backups, regional
+        # variants), so each unique URL is only checked once: url -> channel count
+        channels_by_url = Counter(self._urls)
+        
+        # Hosts are only needed for checking, so they're parsed here, once per
+        # unique URL, rather than for every channel at parse time
+        hosts = {url: _url_host(url) for url in channels_by_url}
+        
+        print(f"\n🔍 Checking {len(self._urls)} links ({len(channels_by_url)} unique)...")
         print(f"⏳ This may take a moment...\n")
         
-        # Create semaphore to limit concurrent requests
-        semaphore = asyncio.Semaphore(max_concurrent)
+        # Recreated per run so they're bound to the currently running event loop
+        self._global_slots = asyncio.Semaphore(max_concurrent)
+        self._host_slots = {}
+        self._max_per_host = max_per_host
         
-        async def check_with_limit(channel):
-            async with semaphore:
-                result = await self.check_link(channel['url'])
-                # Merge result with channel info
-                return {**channel, **result}
+        async def check(session, url):
+            try:
+                return await self._check_with_limit(session, url, hosts[url], timeout)
+            except Exception as e:
+                return {
+                    'url': url,
+                    'working': False,
+                    'status_code': 0,
+                    'error': str(e)[:50] or type(e).__name__,
+                    'response_time': 0
+                }
         
-        # Check all links concurrently
-        tasks = [check_with_limit(channel) for channel in self.channels]
-        self.checked_channels = await asyncio.gather(*tasks)
+        self._results = {}
+        self.working_channels = 0
+        total = len(channels_by_url)
+        progress_step = max(1, total // 10)
         
-        # Count working/dead
-        self.working_channels = sum(1 for ch in self.checked_channels if ch.get('working', False))
-        self.dead_channels = len(self.checked_channels) - self.working_channels
+        # One session for every check so TCP/TLS connections are pooled and reused.
+        # _check_with_limit does the admission control, the connector limits are a backstop.
+        own_session = session is None
+        if own_session:
+            session = create_session(max_concurrent, max_per_host, timeout)
         
-        return self.checked_channels
+        try:
+            await asyncio.to_thread(self._open_cache)
+            
+            # Dispatch same-host URLs back-to-back so they hit the cached
+            # DNS entry and the pooled connections for that host
+            tasks = [
+                asyncio.create_task(check(session, url))
+                for url in sorted(channels_by_url, key=hosts.__getitem__)
+            ]
+            try:
+                # Count results as they arrive instead of waiting for the whole batch
+                for done, next_result in enumerate(asyncio.as_completed(tasks), 1):
+                    result = await next_result
+                    
+                    # Stored once per URL, every channel using it shares the result
+                    self._results[result['url']] = result
+                    if result.get('working', False):
+                        self.working_channels += channels_by_url[result['url']]
+                    
+                    if done % progress_step == 0 or done == total:
+                        print(f"   {done}/{total} links checked, {self.working_channels} channels working")
+            finally:
+                for task in tasks:
+                    task.cancel()
+        finally:
+            await asyncio.to_thread(self._close_cache)
+            if own_session:
+                await session.close()
+        
+        self.dead_channels = len(self._urls) - self.working_channels
+        
+        return list(self._results.values())
         
     def parse_m3u(self, file_path: str = None, content: str = None) -> Dict:
         """
@@ -108,82 +751,74 @@ class PlaylistAnalyzer:
             Dictionary with parsed data
         """
         if file_path:
+            if os.path.getsize(file_path) == 0:
+                return {"error": "No content provided"}
+            
+            # Stream the file line by line instead of loading it all into memory
             with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-        
-        if not content:
+                self._parse_lines(f)
+        elif content:
+            self._parse_content(content)
+        else:
             return {"error": "No content provided"}
         
-        # Parse the M3U content
-        lines = content.strip().split('\n')
+        self.total_channels = len(self._urls)
         
-        current_channel = {}
+        return self.get_basic_stats()
+    
+    def _extend_columns(self, columns: Iterable[Iterable[str]]) -> None:
+        """
+        Extend the column lists with (names, groups, logos, attributes, urls)
+        """
+        own = (self._names, self._groups, self._logos, self._attributes, self._urls)
+        for column, values in zip(own, columns):
+            column.extend(values)
+    
+    def _append_rows(self, rows: Iterable[Tuple[str, str, str, str, str]]) -> None:
+        """
+        Append (name, group, logo, attributes, url) tuples to the column lists
+        """
+        self._extend_columns(zip(*rows))
+    
+    def _parse_content(self, content: str) -> None:
+        """
+        Parse in-memory M3U content
         
-        for line in lines:
-            line = line.strip()
-            
-            # Skip empty lines and M3U header
-            if not line or line == '#EXTM3U':
-                continue
-            
-            # Parse channel info line
-            if line.startswith('#EXTINF:'):
-                # Extract channel name and attributes
-                # Format: #EXTINF:-1 tvg-id="..." tvg-name="..." group-title="...",Channel Name
-                
-                # Get everything after #EXTINF:
-                info = line[8:]
-                
-                # Split by comma to separate attributes from name
-                parts = info.split(',', 1)
-                
-                if len(parts) == 2:
-                    attributes = parts[0]
-                    channel_name = parts[1].strip()
-                    
-                    # Extract group-title (category)
-                    group_match = re.search(r'group-title="([^"]*)"', attributes)
-                    group = group_match.group(1) if group_match else "Uncategorized"
-                    
-                    # Extract tvg-logo
-                    logo_match = re.search(r'tvg-logo="([^"]*)"', attributes)
-                    logo = logo_match.group(1) if logo_match else ""
-                    
-                    current_channel = {
-                        'name': channel_name,
-                        'group': group,
-                        'logo': logo,
-                        'attributes': attributes
-                    }
-                    
-            # Parse URL line
-            elif line.startswith('http://') or line.startswith('https://'):
-                if current_channel:
-                    current_channel['url'] = line
-                    self.channels.append(current_channel)
-                    current_channel = {}
+        Large playlists are split at entry boundaries and parsed in the
+        shared process pool, one chunk per CPU. This blocks until parsing is
+        done, so async callers should run it in a thread (analyze_playlist does).
         
-        self.total_channels = len(self.channels)
+        Args:
+            content: M3U content as string
+        """
+        workers = min(_parse_workers(), len(content) // PARALLEL_PARSE_CHUNK_SIZE)
         
-        return self.get_basic_stats()
+        if workers > 1:
+            for columns in _parse_pool().map(_parse_chunk, _split_content(content, workers)):
+                self._extend_columns(columns)
+        else:
+            self._parse_lines(content.split('\n'))
+    
+    def _parse_lines(self, lines: Iterable[str]) -> None:
+        """
+        Parse M3U lines one at a time, appending each channel's fields
+        
+        Args:
+            lines: Any iterable of lines (open file, StringIO, list)
+        """
+        _parse_m3u_lines(lines, (self._names, self._groups, self._logos, self._attributes, self._urls))
     
     def get_basic_stats(self) -> Dict:
         """
         Get basic statistics about the playlist
         """
-        # Count categories
-        categories = {}
-        for channel in self.channels:
-            group = channel.get('group', 'Uncategorized')
-            categories[group] = categories.get(group, 0) + 1
-        
-        # Sort categories by count
-        sorted_categories = dict(sorted(categories.items(), key=lambda x: x[1], reverse=True))
+        # Count categories, sorted by count
+        sorted_categories = dict(Counter(self._groups).most_common())
         
         return {
             'total_channels': self.total_channels,
             'categories': sorted_categories,
-            'top_5_categories': dict(list(sorted_categories.items())[:5])
+            'top_5_categories': dict(islice(sorted_categories.items(), 5))
         }
     
     def get_detailed_report(self) -> Dict:
@@ -204,61 +839,72 @@ class PlaylistAnalyzer:
                 'working_channels': self.working_channels,
                 'dead_channels': self.dead_channels,
                 'health_percentage': health_percentage,
-                'checked': len(self.checked_channels) > 0
+                'checked': len(self._results) > 0
             },
             'categories': stats['categories'],
-            'channels_sample': self.channels[:10]  # First 10 channels as sample
+            'channels_sample': [self._channel(i) for i in range(min(10, self.total_channels))]  # First 10 channels as sample
         }
         
         # Add dead channels list if we checked links
-        if self.checked_channels:
-            dead_list = [
+        if self._results:
+            dead_list = (
                 {
-                    'name': ch['name'],
-                    'url': ch['url'][:60] + '...' if len(ch['url']) > 60 else ch['url'],
-                    'error': ch.get('error', 'No response')
+                    'name': name,
+                    'url': url[:60] + '...' if len(url) > 60 else url,
+                    'error': self._results[url].get('error', 'No response')
                 }
-                for ch in self.checked_channels 
-                if not ch.get('working', False)
-            ]
-            report['dead_channels_list'] = dead_list[:10]  # First 10 dead channels
+                for name, url in zip(self._names, self._urls)
+                if url in self._results and not self._results[url].get('working', False)
+            )
+            report['dead_channels_list'] = list(islice(dead_list, 10))  # First 10 dead channels
         
         return report
 
 
-async def analyze_playlist(file_path: str, check_links: bool = True) -> Dict:
+async def analyze_playlist(
+    file_path: Optional[str] = None,
+    check_links: bool = True,
+    session: Optional[aiohttp.ClientSession] = None,
+    content: Optional[str] = None,
+    cache_path: Optional[str] = None
+) -> Dict:
     """
     Main function to analyze a playlist
     
     Args:
         file_path: Path to M3U file
         check_links: Whether to check if links are working (default: True)
+        session: Optional shared session from create_session
+        content: M3U content as string (used instead of file_path)
+        cache_path: SQLite file for cached link check results (no caching if None)
         
     Returns:
         Analysis report
     """
-    analyzer = PlaylistAnalyzer()
-    stats = analyzer.parse_m3u(file_path=file_path)
+    analyzer = PlaylistAnalyzer(cache_path=cache_path)
+    # Parsing is blocking (file I/O, regex, possibly the process pool), keep it off the event loop
+    stats = await asyncio.to_thread(analyzer.parse_m3u, file_path=file_path, content=content)
     
     # Check links if requested
     if check_links and analyzer.total_channels > 0:
-        await analyzer.check_all_links()
+        await analyzer.check_all_links(session=session)
     
     return analyzer.get_detailed_report()
 
 
-def analyze_playlist_sync(file_path: str, check_links: bool = True) -> Dict:
+def analyze_playlist_sync(file_path: str, check_links: bool = True, cache_path: Optional[str] = None) -> Dict:
     """
     Synchronous wrapper for analyze_playlist
     
     Args:
         file_path: Path to M3U file
         check_links: Whether to check if links are working (default: True)
+        cache_path: SQLite file for cached link check results (no caching if None)
         
     Returns:
         Analysis report
     """
-    return asyncio.run(analyze_playlist(file_path, check_links))
+    return asyncio.run(analyze_playlist(file_path, check_links, cache_path=cache_path))
 
 
 if __name__ == "__main__":
@@ -271,3 +917,5 @@ if __name__ == "__main__":
     print("  report = analyze_playlist_sync('your_playlist.m3u')")
     print("  # or without link checking:")
     print("  report = analyze_playlist_sync('your_playlist.m3u', check_links=False)")
+    print("  # or cache link check results between runs:")
+    print("  report = analyze_playlist_sync('your_playlist.m3u', cache_path='linkcache.db')")
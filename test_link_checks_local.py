@@ -0,0 +1,318 @@
+"""
+Tests for link checking against local aiohttp servers: retries, backoff,
+admission limits, URL validation and the link cache
+"""
+
+import asyncio
+import socket
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+import playlist_analyzer
+from playlist_analyzer import PlaylistAnalyzer, create_session, _invalid_host_error
+
+
+@asynccontextmanager
+async def serve(handler, hosts=('127.0.0.1',)):
+    """Serve handler for every path on each host, yield their base URLs"""
+    app = web.Application()
+    app.router.add_route('*', '/{path:.*}', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    for host in hosts:
+        await web.TCPSite(runner, host, 0).start()
+    try:
+        yield [f'http://{host}:{port}' for host, port in runner.addresses]
+    finally:
+        await runner.cleanup()
+
+
+def playlist(urls):
+    """Build M3U content with one channel per URL"""
+    return '#EXTM3U\n' + ''.join(f'#EXTINF:-1,Channel {i}\n{url}\n' for i, url in enumerate(urls))
+
+
+async def check_one(url, timeout=5):
+    """Run check_link on a single URL with a fresh session"""
+    async with create_session() as session:
+        return await PlaylistAnalyzer().check_link(session, url, timeout)
+
+
+@pytest.fixture
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(playlist_analyzer, 'RETRY_BASE_DELAY', 0.01)
+
+
+def test_server_errors_are_retried_until_they_succeed(fast_retries):
+    """5xx responses are retried, a later success counts as working"""
+    hits = Counter()
+
+    async def handler(request):
+        hits[request.path] += 1
+        if hits[request.path] <= playlist_analyzer.MAX_RETRIES:
+            return web.Response(status=503)
+        return web.Response(status=206, content_type='video/mp2t')
+
+    async def main():
+        async with serve(handler) as (base,):
+            return await check_one(f'{base}/flaky')
+
+    result = asyncio.run(main())
+    assert hits['/flaky'] == playlist_analyzer.MAX_RETRIES + 1
+    assert result['working'] and result['status_code'] == 206
+
+
+def test_server_errors_give_up_after_max_retries(fast_retries):
+    """A host that keeps failing is tried MAX_RETRIES + 1 times, then reported dead"""
+    hits = Counter()
+
+    async def handler(request):
+        hits[request.path] += 1
+        return web.Response(status=500)
+
+    async def main():
+        async with serve(handler) as (base,):
+            return await check_one(f'{base}/down')
+
+    result = asyncio.run(main())
+    assert hits['/down'] == playlist_analyzer.MAX_RETRIES + 1
+    assert not result['working'] and result['status_code'] == 500
+
+
+def test_client_errors_are_not_retried(fast_retries):
+    """A 404 is final, the URL is only requested once"""
+    hits = Counter()
+
+    async def handler(request):
+        hits[request.path] += 1
+        return web.Response(status=404)
+
+    async def main():
+        async with serve(handler) as (base,):
+            return await check_one(f'{base}/gone')
+
+    result = asyncio.run(main())
+    assert hits['/gone'] == 1
+    assert not result['working'] and result['status_code'] == 404
+
+
+def test_retry_after_is_capped_at_timeout():
+    """A long Retry-After on 429 waits at most `timeout` seconds per retry"""
+    hits = Counter()
+
+    async def handler(request):
+        hits[request.path] += 1
+        return web.Response(status=429, headers={'Retry-After': '60'})
+
+    async def main():
+        async with serve(handler) as (base,):
+            start = time.perf_counter()
+            result = await check_one(f'{base}/limited', timeout=1)
+            return result, time.perf_counter() - start
+
+    result, elapsed = asyncio.run(main())
+    assert hits['/limited'] == playlist_analyzer.MAX_RETRIES + 1
+    assert result['status_code'] == 429
+    assert playlist_analyzer.MAX_RETRIES <= elapsed < playlist_analyzer.MAX_RETRIES + 1
+
+
+def test_connection_resets_are_retried(fast_retries):
+    """A server that drops the connection is tried again"""
+    accepted = []
+
+    async def drop(reader, writer):
+        accepted.append(1)
+        writer.close()
+
+    async def main():
+        server = await asyncio.start_server(drop, '127.0.0.1', 0)
+        url = f'http://127.0.0.1:{server.sockets[0].getsockname()[1]}/reset'
+        async with server:
+            # aiohttp may reconnect on its own within one request, count that first
+            async with aiohttp.ClientSession() as session:
+                with pytest.raises(aiohttp.ClientConnectionError):
+                    await session.get(url)
+            per_request = len(accepted)
+            accepted.clear()
+            return await check_one(url), per_request
+
+    result, per_request = asyncio.run(main())
+    assert len(accepted) == per_request * (playlist_analyzer.MAX_RETRIES + 1)
+    assert not result['working'] and result['status_code'] == 0
+
+
+def test_dns_errors_are_not_retried(fast_retries):
+    """A host that doesn't resolve is only looked up once"""
+
+    class FailingResolver(aiohttp.abc.AbstractResolver):
+        lookups = 0
+
+        async def resolve(self, host, port=0, family=socket.AF_INET):
+            FailingResolver.lookups += 1
+            raise OSError(socket.EAI_NONAME, 'Name or service not known')
+
+        async def close(self):
+            pass
+
+    async def main():
+        connector = aiohttp.TCPConnector(resolver=FailingResolver(), use_dns_cache=False)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            return await PlaylistAnalyzer().check_link(session, 'http://stream.example.com/live')
+
+    result = asyncio.run(main())
+    assert FailingResolver.lookups == 1
+    assert not result['working'] and result['status_code'] == 0
+
+
+def test_timeout_is_a_wall_clock_limit():
+    """A host trickling response headers is cut off after `timeout`, not retried"""
+    accepted = []
+
+    async def trickle(reader, writer):
+        accepted.append(1)
+        await reader.readuntil(b'\r\n\r\n')
+        writer.write(b'HTTP/1.1 200 OK\r\n')
+        try:
+            for i in range(10):
+                await asyncio.sleep(0.2)
+                writer.write(b'X-Trickle-%d: 1\r\n' % i)
+                await writer.drain()
+            writer.write(b'Content-Length: 0\r\n\r\n')
+            await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        writer.close()
+
+    async def main():
+        server = await asyncio.start_server(trickle, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            start = time.perf_counter()
+            result = await check_one(f'http://127.0.0.1:{port}/slow', timeout=0.5)
+            return result, time.perf_counter() - start
+
+    result, elapsed = asyncio.run(main())
+    assert len(accepted) == 1
+    assert result['error'] == 'Timeout' and not result['working']
+    assert elapsed < 1
+    assert 0.4 <= result['response_time'] < 1
+
+
+def test_admission_limits_per_host_and_overall():
+    """In-flight checks never exceed max_per_host per host or max_concurrent overall"""
+    in_flight = Counter()
+    peak = Counter()
+
+    async def handler(request):
+        host = request.host.rsplit(':', 1)[0]
+        in_flight[host] += 1
+        in_flight['all'] += 1
+        peak[host] = max(peak[host], in_flight[host])
+        peak['all'] = max(peak['all'], in_flight['all'])
+        await asyncio.sleep(0.05)
+        in_flight[host] -= 1
+        in_flight['all'] -= 1
+        return web.Response(status=200)
+
+    async def main():
+        async with serve(handler, hosts=('127.0.0.1', '127.0.0.2', '127.0.0.3')) as bases:
+            analyzer = PlaylistAnalyzer()
+            analyzer.parse_m3u(content=playlist(f'{base}/{i}' for base in bases for i in range(8)))
+            # Connector limits well above the analyzer's, like the API's shared pool
+            async with create_session(max_concurrent=100, max_per_host=100) as session:
+                await analyzer.check_all_links(max_concurrent=5, max_per_host=2, session=session)
+            return analyzer
+
+    analyzer = asyncio.run(main())
+    assert analyzer.working_channels == 24
+    assert peak['all'] == 5
+    assert max(peak[host] for host in ('127.0.0.1', '127.0.0.2', '127.0.0.3')) == 2
+
+
+def test_backoff_releases_the_host_slot(monkeypatch):
+    """Other URLs on a host are checked while one of its URLs backs off"""
+    monkeypatch.setattr(playlist_analyzer, 'RETRY_BASE_DELAY', 0.2)
+    hits = []
+
+    async def handler(request):
+        hits.append(request.path)
+        return web.Response(status=503 if request.path == '/busy' else 200)
+
+    async def main():
+        async with serve(handler) as (base,):
+            analyzer = PlaylistAnalyzer()
+            # The failing URL is listed (and dispatched) first
+            analyzer.parse_m3u(content=playlist([f'{base}/busy'] + [f'{base}/{i}' for i in range(5)]))
+            await analyzer.check_all_links(max_per_host=1)
+            return analyzer
+
+    analyzer = asyncio.run(main())
+    assert analyzer.working_channels == 5
+    # All the other URLs got the slot between the first and second /busy attempts
+    assert hits.index('/busy', 1) == 6
+    assert hits.count('/busy') == playlist_analyzer.MAX_RETRIES + 1
+
+
+@pytest.mark.parametrize('host, error', [
+    ('', 'Invalid URL'),
+    ('192.168.1.256', 'Invalid IP address'),
+    ('999.1.1.1', 'Invalid IP address'),
+    ('cdn.invalid', 'Reserved domain'),
+    ('stream.test', 'Reserved domain'),
+    ('tv.localhost', 'Reserved domain'),
+    ('localhost', None),
+    ('192.168.1.255', None),
+    ('cdn.example.com', None),
+])
+def test_invalid_host_error(host, error):
+    """Hosts that can never resolve are rejected, anything plausible isn't"""
+    assert _invalid_host_error(host) == error
+
+
+def test_invalid_hosts_are_rejected_without_a_request():
+    """Unreachable URLs are reported dead without opening a connection"""
+
+    async def main():
+        analyzer = PlaylistAnalyzer()
+        analyzer.parse_m3u(content=playlist(['http://cdn.invalid/live', 'http://10.0.0.300/live']))
+        # A closed session fails any request that does get made
+        session = create_session()
+        await session.close()
+        return await analyzer.check_all_links(session=session)
+
+    results = {result['url']: result['error'] for result in asyncio.run(main())}
+    assert results == {
+        'http://cdn.invalid/live': 'Reserved domain',
+        'http://10.0.0.300/live': 'Invalid IP address',
+    }
+
+
+def test_cache_ttl_depends_on_outcome(tmp_path, monkeypatch):
+    """Working results are served from the cache, failed ones are re-checked once expired"""
+    monkeypatch.setattr(playlist_analyzer, 'CACHE_TTL_FAILED', 0)
+    hits = Counter()
+
+    async def handler(request):
+        hits[request.path] += 1
+        return web.Response(status=200 if request.path == '/ok' else 404)
+
+    async def main():
+        cache_path = str(tmp_path / 'links.db')
+        async with serve(handler) as (base,):
+            runs = []
+            for _ in range(2):
+                analyzer = PlaylistAnalyzer(cache_path=cache_path)
+                analyzer.parse_m3u(content=playlist([f'{base}/ok', f'{base}/missing']))
+                runs.append({r['url'].rsplit('/', 1)[-1]: r for r in await analyzer.check_all_links()})
+            return runs
+
+    first, second = asyncio.run(main())
+    assert hits == {'/ok': 1, '/missing': 2}
+    assert second['ok']['cached'] and 'cached' not in second['missing']
+    # A cached result carries the same fields as the live one it came from
+    assert {k: v for k, v in second['ok'].items() if k != 'cached'} == first['ok']
@@ -0,0 +1,98 @@
+"""
+Tests for playlist parsing: file, in-memory and chunked parsing must agree
+"""
+
+import random
+import playlist_analyzer
+from playlist_analyzer import PlaylistAnalyzer, _parse_chunk, _split_content
+
+# Lines covering the formats the parsers have to handle: attributes with and
+# without commas, directives between #EXTINF and URL, CRLF, stray URLs, etc.
+SAMPLE_LINES = [
+    '#EXTM3U',
+    '#EXTINF:-1 tvg-id="a" tvg-logo="http://logo/a.png" group-title="News",News One',
+    '#EXTINF:-1 group-title="Sports, Live",Sports Two',
+    '#EXTINF:-1,No Attributes',
+    '#EXTINF:-1 no comma at all',
+    '#EXTINF:0 group-title="Movies",Movie Three\r',
+    '\t#EXTINF:-1 group-title="Kids",  Padded Name  ',
+    '#EXTVLCOPT:http-user-agent=Foo',
+    '#EXTGRP:Backup',
+    'http://host1.example/live/1.m3u8',
+    'https://host2.example/live/2.ts  ',
+    '  http://192.168.999.999:8080/stream.m3u8\r',
+    'http://[bad/url',
+    'rtmp://host3.example/live',
+    '',
+    '   ',
+]
+
+
+def make_playlist(seed, lines=200):
+    """Build a random but reproducible playlist from SAMPLE_LINES"""
+    rng = random.Random(seed)
+    newline = rng.choice(['\n', '\r\n'])
+    return newline.join(rng.choice(SAMPLE_LINES) for _ in range(lines)) + newline
+
+
+def serial_columns(content):
+    """Parse content in one pass and return the channel columns"""
+    return tuple(list(column) for column in _parse_chunk(content))
+
+
+def test_split_chunks_cover_content():
+    """Chunks must add back up to the original content"""
+    for seed in range(50):
+        content = make_playlist(seed)
+        for parts in range(1, 9):
+            assert ''.join(_split_content(content, parts)) == content
+
+
+def test_chunked_parse_matches_serial_parse():
+    """Parsing chunk by chunk and merging must equal parsing the whole buffer"""
+    for seed in range(50):
+        content = make_playlist(seed)
+        expected = serial_columns(content)
+
+        for parts in range(1, 9):
+            merged = tuple([] for _ in expected)
+            for columns in map(_parse_chunk, _split_content(content, parts)):
+                for column, values in zip(merged, columns):
+                    column.extend(values)
+            assert merged == expected, f"seed={seed} parts={parts}"
+
+
+def test_content_parse_matches_file_parse(tmp_path):
+    """Parsing content in memory must find the same channels as streaming the file"""
+    path = tmp_path / 'playlist.m3u'
+    for seed in range(200):
+        content = make_playlist(seed, lines=30)
+        path.write_text(content, encoding='utf-8', newline='')
+
+        from_content = PlaylistAnalyzer()
+        from_content.parse_m3u(content=content)
+
+        from_file = PlaylistAnalyzer()
+        from_file.parse_m3u(file_path=str(path))
+
+        assert from_content.channels == from_file.channels, f"seed={seed}"
+
+
+def test_process_pool_parse_matches_serial_parse(monkeypatch):
+    """Going through the shared process pool must not change the result"""
+    content = make_playlist(0, lines=5000)
+
+    serial = PlaylistAnalyzer()
+    serial.parse_m3u(content=content)
+
+    # Force the pool path regardless of playlist size and CPU count
+    monkeypatch.setattr(playlist_analyzer, 'PARALLEL_PARSE_CHUNK_SIZE', 1)
+    monkeypatch.setattr(playlist_analyzer, 'available_cpus', lambda: 3)
+    try:
+        pooled = PlaylistAnalyzer()
+        pooled.parse_m3u(content=content)
+    finally:
+        playlist_analyzer.shutdown_parse_pool()
+
+    assert pooled.total_channels == serial.total_channels > 0
+    assert pooled.channels == serial.channels